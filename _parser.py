@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""Keychain dump parsing, split out so it can be compiled with mypyc.
+
+Build the compiled extension with `python setup.py build_ext --inplace`;
+it shadows this module under the same name, so importers need no fallback
+logic. The pure-Python version is used when no extension is present.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# Matches one dump-keychain record (account and service attributes plus the
+# optional decrypted data section, either quoted or a hex blob). Applied per
+# record so field matching runs in C instead of a per-line Python loop.
+KEYCHAIN_RECORD_RE = re.compile(
+    rb'"acct"<blob>="([^"]*)"'
+    rb'.*?"svce"<blob>="([^"]*)"'
+    rb'(?:.*?^data:\n(?:"([^"]*)"|0x([0-9A-Fa-f]+)))?',
+    re.DOTALL | re.MULTILINE
+)
+
+@dataclass(slots=True)
+class KeychainItem:
+    account: str
+    service: str
+    password: str
+
+def parse_dump(raw: bytes) -> Tuple[List[KeychainItem], int]:
+    """Parse `security dump-keychain -d` output into deduplicated items.
+
+    Returns the items and the number of raw records matched, so the caller
+    can report how many duplicates were collapsed. Only the captured
+    acct/svce/data slices are ever UTF-8 decoded, never the full dump.
+    """
+    # Keychains commonly hold duplicate (service, account) pairs
+    # (Safari autofill, internet vs generic passwords); keep the
+    # last-seen password per pair
+    seen: Dict[Tuple[str, str], KeychainItem] = {}
+    total = 0
+    for record in raw.split(b'keychain: '):
+        match = KEYCHAIN_RECORD_RE.search(record)
+        if not match:
+            continue
+        acct, svce, data, hex_blob = match.groups()
+        if hex_blob is not None:
+            password = bytes.fromhex(hex_blob.decode('ascii')).decode('utf-8', 'replace')
+        elif data is not None:
+            password = data.decode('utf-8', 'replace')
+        else:
+            password = ''
+        account = acct.decode('utf-8', 'replace')
+        service = svce.decode('utf-8', 'replace')
+        seen[(service, account)] = KeychainItem(
+            account=account,
+            service=service,
+            password=password
+        )
+        total += 1
+
+    return list(seen.values()), total
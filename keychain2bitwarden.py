@@ -1,33 +1,45 @@
 #!/usr/bin/env python3
 
 import subprocess
-import json
-import argparse
+import orjson
 import sys
+import os
+import time
+import threading
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-import keyring
-import getpass
 from dataclasses import dataclass
 import logging
-from datetime import datetime
 
-@dataclass
-class KeychainItem:
-    account: str
-    service: str
-    password: str
-    
-@dataclass
+from _parser import KeychainItem, parse_dump
+
+# argparse, getpass and datetime are imported lazily inside the functions
+# that use them to keep module import (and so cold start) cheap
+
+BW_SERVE_PORT = 8087
+BW_CREATE_WORKERS = 8
+# Below this many keychain items, per-item filtered searches against
+# bw serve beat downloading and parsing the whole vault
+BW_SEARCH_THRESHOLD = 50
+
+@dataclass(slots=True)
 class BitwardenItem:
     id: str
     name: str
+    service: str
     login: Dict
     
 class KeychainBitwardenSync:
     def __init__(self):
         self.logger = self._setup_logging()
         self.bw_session: Optional[str] = None
-        
+        self._bw_serve: Optional[subprocess.Popen] = None
+        self._serve_ready = False
+        self._local = threading.local()
+        self._import_stamp: Optional[str] = None
+
     def _setup_logging(self) -> logging.Logger:
         logger = logging.getLogger('keychain-bw-sync')
         logger.setLevel(logging.INFO)
@@ -42,69 +54,147 @@ class KeychainBitwardenSync:
     def _get_keychain_items(self) -> List[KeychainItem]:
         """Retrieve all password items from macOS Keychain."""
         try:
-            # Using security command-line tool to list all generic passwords
+            # Using security command-line tool to list all generic passwords.
+            # The raw bytes go straight to the (optionally mypyc-compiled)
+            # dump parser in _parser.py.
             cmd = ['security', 'dump-keychain', '-d']
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                self.logger.error(f"Failed to retrieve keychain items: {result.stderr}")
+            process = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            # communicate() drains both pipes; reading stdout alone would
+            # deadlock once the per-item warnings on stderr fill its buffer
+            raw, err = process.communicate()
+
+            if process.returncode != 0:
+                self.logger.error(f"Failed to retrieve keychain items: {err.decode('utf-8', 'replace')}")
                 return []
-                
-            items = []
-            current_item = {}
-            
-            for line in result.stdout.split('\n'):
-                if 'keychain: ' in line:
-                    if current_item:
-                        items.append(KeychainItem(
-                            account=current_item.get('acct', ''),
-                            service=current_item.get('svce', ''),
-                            password=self._get_keychain_password(
-                                current_item.get('acct', ''),
-                                current_item.get('svce', '')
-                            )
-                        ))
-                    current_item = {}
-                elif '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip('" ')
-                    value = value.strip('" ')
-                    current_item[key] = value
-            
+
+            items, total = parse_dump(raw)
+            if total > len(items):
+                self.logger.info(f"Collapsed {total - len(items)} duplicate keychain entries")
+
             return items
-            
+
         except Exception as e:
             self.logger.error(f"Error retrieving keychain items: {str(e)}")
             return []
     
-    def _get_keychain_password(self, account: str, service: str) -> str:
-        """Retrieve specific password from keychain."""
-        try:
-            return keyring.get_password(service, account) or ''
-        except Exception as e:
-            self.logger.error(f"Error retrieving password for {account}@{service}: {str(e)}")
-            return ''
-    
     def _login_bitwarden(self) -> bool:
         """Log in to Bitwarden CLI."""
         try:
+            import getpass
+
             email = input("Bitwarden email: ")
-            password = getpass.getpass("Bitwarden master password: ")
-            
+            password = bytearray(getpass.getpass("Bitwarden master password: "), 'utf-8')
+
             # Login to Bitwarden
             login_cmd = ['bw', 'login', email, '--raw']
-            result = subprocess.run(login_cmd, input=password.encode(), capture_output=True)
-            
+            try:
+                result = subprocess.run(
+                    login_cmd, input=bytes(password),
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+                )
+            finally:
+                # Zero the master password buffer as soon as bw has it
+                for i in range(len(password)):
+                    password[i] = 0
+
             if result.returncode != 0:
                 self.logger.error("Failed to login to Bitwarden")
                 return False
-            
-            self.bw_session = result.stdout.decode().strip()
+
+            # Strip on the raw bytes and decode only the short session token
+            self.bw_session = result.stdout.strip().decode('ascii')
+
+            # Capability check: prefer the long-lived daemon, but older bw
+            # versions without `bw serve` can still sync one exec at a time
+            if not self._start_bw_serve():
+                self.logger.warning("bw serve unavailable; falling back to one bw create per item")
             return True
-            
+
         except Exception as e:
             self.logger.error(f"Error logging into Bitwarden: {str(e)}")
             return False
+
+    def _start_bw_serve(self) -> bool:
+        """Start a long-lived `bw serve` daemon so item creation is a cheap
+        HTTP request instead of a fresh `bw` process per item."""
+        try:
+            self._bw_serve = subprocess.Popen(
+                ['bw', 'serve', '--port', str(BW_SERVE_PORT)],
+                env={**os.environ, 'BW_SESSION': self.bw_session},
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+
+            # Poll until the daemon answers /status
+            conn = self._serve_connection()
+            for _ in range(50):
+                try:
+                    conn.request('GET', '/status')
+                    conn.getresponse().read()
+                    # An answer alone is not enough: if the port was
+                    # already taken our child failed to bind and died,
+                    # and the reply came from a foreign listener that
+                    # must never see vault items
+                    if self._bw_serve.poll() is not None:
+                        self.logger.debug("bw serve exited with status %s", self._bw_serve.returncode)
+                        break
+                    self._serve_ready = True
+                    return True
+                except (ConnectionError, OSError):
+                    conn.close()
+                    # A bw without the serve subcommand exits straight
+                    # away; don't keep retrying against a dead child
+                    if self._bw_serve.poll() is not None:
+                        self.logger.debug("bw serve exited with status %s", self._bw_serve.returncode)
+                        break
+                    time.sleep(0.1)
+            else:
+                self.logger.debug("Timed out waiting for bw serve to start")
+
+            self.close()
+            return False
+
+        except Exception as e:
+            self.logger.debug("Error starting bw serve: %s", str(e))
+            return False
+
+    def _serve_connection(self) -> http.client.HTTPConnection:
+        """Per-thread keep-alive connection to the bw serve daemon
+        (http.client connections are not thread-safe)."""
+        conn = getattr(self._local, 'http', None)
+        if conn is None:
+            conn = http.client.HTTPConnection('localhost', BW_SERVE_PORT)
+            self._local.http = conn
+        return conn
+
+    def close(self) -> None:
+        """Lock the vault and shut down the `bw serve` daemon."""
+        if self._serve_ready:
+            conn = self._serve_connection()
+            try:
+                # Best effort; close() can run from __del__ at interpreter
+                # shutdown, where even unrelated errors must not escape
+                conn.request('POST', '/lock')
+                conn.getresponse().read()
+            except Exception:
+                pass
+            conn.close()
+            self._serve_ready = False
+        if self._bw_serve:
+            self._bw_serve.terminate()
+            self._bw_serve.wait()
+            self._bw_serve = None
+
+    def __enter__(self) -> 'KeychainBitwardenSync':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __del__(self):
+        self.close()
     
     def _get_bitwarden_items(self) -> List[BitwardenItem]:
         """Retrieve all items from Bitwarden vault."""
@@ -113,16 +203,21 @@ class KeychainBitwardenSync:
                 return []
                 
             cmd = ['bw', 'list', 'items', '--session', self.bw_session]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
+            result = subprocess.run(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+
             if result.returncode != 0:
                 self.logger.error("Failed to retrieve Bitwarden items")
                 return []
-                
-            items = json.loads(result.stdout)
+
+            # orjson parses the raw bytes directly, skipping a full UTF-8
+            # decode of the vault dump
+            items = orjson.loads(result.stdout)
             return [BitwardenItem(
                 id=item['id'],
                 name=item['name'],
+                service=item['name'].split(' - ', 1)[0],
                 login=item.get('login', {})
             ) for item in items]
             
@@ -130,38 +225,81 @@ class KeychainBitwardenSync:
             self.logger.error(f"Error retrieving Bitwarden items: {str(e)}")
             return []
     
+    def _bitwarden_item_exists(self, keychain_item: KeychainItem) -> bool:
+        """Check for one item via a filtered search against bw serve."""
+        try:
+            conn = self._serve_connection()
+            conn.request(
+                'GET',
+                '/list/object/items?search=' + urllib.parse.quote(keychain_item.service)
+            )
+            response = conn.getresponse()
+            body = response.read()
+
+            if response.status != 200:
+                return False
+
+            for item in orjson.loads(body)['data']['data']:
+                if (item.get('login', {}).get('username', '') == keychain_item.account
+                        and item['name'].split(' - ', 1)[0] == keychain_item.service):
+                    return True
+            return False
+
+        except Exception as e:
+            self.logger.error(f"Error searching Bitwarden items: {str(e)}")
+            return False
+
     def _create_bitwarden_item(self, keychain_item: KeychainItem) -> bool:
-        """Create new item in Bitwarden vault."""
+        """Create new item in Bitwarden vault, via the bw serve daemon when
+        available and a one-shot bw create otherwise."""
         try:
             if not self.bw_session:
                 return False
-                
+
+            if self._import_stamp is None:
+                from datetime import datetime
+                self._import_stamp = datetime.now().isoformat()
+
+            # Fields left out (organizationId, folderId, favorite, uri
+            # match) take the same defaults server-side; omitting them
+            # shrinks every payload
             item_data = {
-                'organizationId': None,
-                'folderId': None,
                 'type': 1,
                 'name': f"{keychain_item.service} - {keychain_item.account}",
-                'notes': f"Imported from macOS Keychain on {datetime.now().isoformat()}",
-                'favorite': False,
+                'notes': f"Imported from macOS Keychain on {self._import_stamp}",
                 'login': {
                     'username': keychain_item.account,
                     'password': keychain_item.password,
                     'uris': [
                         {
-                            'match': None,
                             'uri': f"https://{keychain_item.service}"
                         }
                     ]
                 }
             }
             
-            cmd = ['bw', 'create', 'item', '--session', self.bw_session]
-            result = subprocess.run(cmd, input=json.dumps(item_data).encode(), capture_output=True)
-            
-            if result.returncode != 0:
+            if self._serve_ready:
+                conn = self._serve_connection()
+                conn.request(
+                    'POST', '/object/item',
+                    orjson.dumps(item_data),
+                    {'Content-Type': 'application/json'}
+                )
+                response = conn.getresponse()
+                response.read()
+                success = response.status == 200
+            else:
+                cmd = ['bw', 'create', 'item', '--session', self.bw_session]
+                result = subprocess.run(
+                    cmd, input=orjson.dumps(item_data),
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                success = result.returncode == 0
+
+            if not success:
                 self.logger.error(f"Failed to create Bitwarden item for {keychain_item.account}@{keychain_item.service}")
                 return False
-                
+
             return True
             
         except Exception as e:
@@ -170,42 +308,94 @@ class KeychainBitwardenSync:
     
     def sync(self, check_only: bool = True) -> None:
         """Main sync function."""
-        if not self._login_bitwarden():
+        # The keychain dump is independent of Bitwarden credentials, so run
+        # it in the background while the user types them and bw login runs
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            kc_future = prefetch.submit(self._get_keychain_items)
+
+            if not self._login_bitwarden():
+                return
+
+            keychain_items = kc_future.result()
+
+        if not keychain_items:
+            # Nothing to diff; don't fetch the vault just to compare it
+            # against an empty keychain
+            self.logger.info("No keychain items found")
             return
-            
-        keychain_items = self._get_keychain_items()
-        bitwarden_items = self._get_bitwarden_items()
-        
-        # Create lookup dictionary for Bitwarden items
-        bw_lookup = {
-            f"{item.login.get('username', '')}@{item.name.split(' - ')[0]}": item
-            for item in bitwarden_items
-        }
-        
+
+        if self._serve_ready and len(keychain_items) <= BW_SEARCH_THRESHOLD:
+            # Small keychain: a handful of filtered searches is cheaper
+            # than downloading and parsing the entire vault. The vault
+            # size is unknown until fetched, so the keychain size is the
+            # deciding input.
+            existing = self._bitwarden_item_exists
+        else:
+            bitwarden_items = self._get_bitwarden_items()
+
+            # Only membership is ever tested, so a set of (username,
+            # service) tuples is enough - half the size of a dict for
+            # large vaults, and tuple hashing is a single C call
+            bw_keys = {
+                (item.login.get('username', ''), item.service)
+                for item in bitwarden_items
+            }
+
+            def existing(kc_item: KeychainItem) -> bool:
+                return (kc_item.account, kc_item.service) in bw_keys
+
+        missing = []
         for kc_item in keychain_items:
+            if not existing(kc_item):
+                self.logger.info(f"New item found: {kc_item.account}@{kc_item.service}")
+                missing.append(kc_item)
+            elif self.logger.isEnabledFor(logging.DEBUG):
+                # Guard so the message isn't formatted per item when DEBUG
+                # is off; %s defers the formatting to the handler
+                self.logger.debug("Item already exists in Bitwarden: %s@%s",
+                                  kc_item.account, kc_item.service)
+
+        if check_only or not missing:
+            return
+
+        # One timestamp for the whole run; _create_bitwarden_item reuses it
+        # instead of calling datetime.now() per item
+        from datetime import datetime
+        self._import_stamp = datetime.now().isoformat()
+
+        # Fan the creates out over a thread pool so the per-item network
+        # round trips to the Bitwarden server overlap.
+        progress_lock = threading.Lock()
+        created = 0
+
+        def create(kc_item: KeychainItem) -> bool:
+            nonlocal created
+            success = self._create_bitwarden_item(kc_item)
             key = f"{kc_item.account}@{kc_item.service}"
-            
-            if key not in bw_lookup:
-                self.logger.info(f"New item found: {key}")
-                if not check_only:
-                    if self._create_bitwarden_item(kc_item):
-                        self.logger.info(f"Successfully created Bitwarden item for {key}")
-                    else:
-                        self.logger.error(f"Failed to create Bitwarden item for {key}")
-            else:
-                self.logger.debug(f"Item already exists in Bitwarden: {key}")
+            with progress_lock:
+                if success:
+                    created += 1
+                    self.logger.info(f"Successfully created Bitwarden item for {key} ({created}/{len(missing)})")
+                else:
+                    self.logger.error(f"Failed to create Bitwarden item for {key}")
+            return success
+
+        with ThreadPoolExecutor(max_workers=BW_CREATE_WORKERS) as executor:
+            list(executor.map(create, missing))
 
 def main():
+    import argparse
+
     parser = argparse.ArgumentParser(description='Sync macOS Keychain passwords to Bitwarden')
     parser.add_argument('--write', action='store_true', help='Enable writing updates to Bitwarden')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     args = parser.parse_args()
     
-    syncer = KeychainBitwardenSync()
-    if args.verbose:
-        syncer.logger.setLevel(logging.DEBUG)
-    
-    syncer.sync(check_only=not args.write)
+    with KeychainBitwardenSync() as syncer:
+        if args.verbose:
+            syncer.logger.setLevel(logging.DEBUG)
+
+        syncer.sync(check_only=not args.write)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+from setuptools import setup
+
+try:
+    # Compile the hot dump parser to a C extension when mypyc is available;
+    # the build output shadows _parser.py under the same module name
+    from mypyc.build import mypycify
+    ext_modules = mypycify(['_parser.py'])
+except ImportError:
+    ext_modules = []
+
+setup(
+    name='keychain2bitwarden',
+    py_modules=['keychain2bitwarden', '_parser'],
+    ext_modules=ext_modules,
+)
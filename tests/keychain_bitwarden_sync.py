@@ -41,6 +41,7 @@ def sample_bitwarden_items():
         BitwardenItem(
             id='item1',
             name='example.com - user1@example.com',
+            service='example.com',
             login={
                 'username': 'user1@example.com',
                 'password': 'password123'
@@ -49,62 +50,70 @@ def sample_bitwarden_items():
     ]
 
 class TestKeychainItemRetrieval:
-    @patch('subprocess.run')
-    @patch('keyring.get_password')
-    def test_get_keychain_items_success(self, mock_get_password, mock_run, sync_app):
-        # Mock the security command output
-        mock_run.return_value = Mock(
+    @patch('subprocess.Popen')
+    def test_get_keychain_items_success(self, mock_popen, sync_app):
+        # Mock the security dump-keychain -d output
+        mock_popen.return_value = Mock(
             returncode=0,
-            stdout='''
+            communicate=Mock(return_value=(b'''
 keychain: "/Users/test/Library/Keychains/login.keychain-db"
 class: "genp"
 attributes:
-    0x00000007 <blob>="example.com"  (service)
-    0x00000008 <blob>="user1@example.com"  (account)
-            
+    "acct"<blob>="user1@example.com"
+    "svce"<blob>="example.com"
+data:
+"password123"
+
 keychain: "/Users/test/Library/Keychains/login.keychain-db"
 class: "genp"
 attributes:
-    0x00000007 <blob>="test.com"  (service)
-    0x00000008 <blob>="user2@test.com"  (account)
-'''
+    "acct"<blob>="user2@test.com"
+    "svce"<blob>="test.com"
+data:
+0x70617373776f7264343536  "password456"
+''', b''))
         )
-        
-        # Mock password retrieval
-        mock_get_password.side_effect = ['password123', 'password456']
-        
+
         items = sync_app._get_keychain_items()
-        
+
         assert len(items) == 2
         assert items[0].service == 'example.com'
         assert items[0].account == 'user1@example.com'
+        assert items[0].password == 'password123'
         assert items[1].service == 'test.com'
         assert items[1].account == 'user2@test.com'
+        assert items[1].password == 'password456'
+
+    @patch('subprocess.Popen')
+    def test_get_keychain_items_failure(self, mock_popen, sync_app):
+        mock_popen.return_value = Mock(
+            returncode=1,
+            communicate=Mock(return_value=(b'', b'Access denied'))
+        )
 
-    @patch('subprocess.run')
-    def test_get_keychain_items_failure(self, mock_run, sync_app):
-        mock_run.return_value = Mock(returncode=1, stderr='Access denied')
-        
         items = sync_app._get_keychain_items()
         assert len(items) == 0
 
 class TestBitwardenAuthentication:
+    @patch.object(KeychainBitwardenSync, '_start_bw_serve')
     @patch('subprocess.run')
     @patch('getpass.getpass')
     @patch('builtins.input')
-    def test_login_bitwarden_success(self, mock_input, mock_getpass, mock_run, sync_app):
+    def test_login_bitwarden_success(self, mock_input, mock_getpass, mock_run, mock_serve, sync_app):
         mock_input.return_value = 'test@example.com'
         mock_getpass.return_value = 'masterpass'
         mock_run.return_value = Mock(
             returncode=0,
             stdout=b'mock-session-token'
         )
-        
+        mock_serve.return_value = True
+
         result = sync_app._login_bitwarden()
-        
+
         assert result is True
         assert sync_app.bw_session == 'mock-session-token'
         mock_run.assert_called_once()
+        mock_serve.assert_called_once()
 
     @patch('subprocess.run')
     @patch('getpass.getpass')
@@ -132,7 +141,7 @@ class TestBitwardenOperations:
                     'username': 'user1@example.com',
                     'password': 'password123'
                 }
-            }])
+            }]).encode()
         )
         
         items = sync_app._get_bitwarden_items()
@@ -140,6 +149,7 @@ class TestBitwardenOperations:
         assert len(items) == 1
         assert items[0].id == 'item1'
         assert items[0].name == 'example.com - user1@example.com'
+        assert items[0].service == 'example.com'
 
     @patch('subprocess.run')
     def test_get_bitwarden_items_no_session(self, mock_run, sync_app):
@@ -148,28 +158,77 @@ class TestBitwardenOperations:
         assert len(items) == 0
         mock_run.assert_not_called()
 
-    @patch('subprocess.run')
-    def test_create_bitwarden_item_success(self, mock_run, sync_app):
+    @patch.object(KeychainBitwardenSync, '_serve_connection')
+    def test_bitwarden_item_exists(self, mock_serve_conn, sync_app):
+        mock_conn = Mock()
+        mock_conn.getresponse.return_value = Mock(
+            status=200,
+            read=Mock(return_value=json.dumps({
+                'data': {
+                    'data': [{
+                        'name': 'example.com - user1@example.com',
+                        'login': {'username': 'user1@example.com'}
+                    }]
+                }
+            }).encode())
+        )
+        mock_serve_conn.return_value = mock_conn
+
+        assert sync_app._bitwarden_item_exists(
+            KeychainItem('user1@example.com', 'example.com', 'pw')
+        ) is True
+        assert sync_app._bitwarden_item_exists(
+            KeychainItem('other@example.com', 'example.com', 'pw')
+        ) is False
+
+    @patch.object(KeychainBitwardenSync, '_serve_connection')
+    def test_create_bitwarden_item_success(self, mock_serve_conn, sync_app):
         sync_app.bw_session = 'mock-session'
+        sync_app._serve_ready = True
+        mock_conn = Mock()
+        mock_conn.getresponse.return_value = Mock(status=200)
+        mock_serve_conn.return_value = mock_conn
         keychain_item = KeychainItem(
             account='new@example.com',
             service='example.com',
             password='newpass123'
         )
-        
-        mock_run.return_value = Mock(returncode=0)
-        
+
         result = sync_app._create_bitwarden_item(keychain_item)
-        
+
         assert result is True
-        mock_run.assert_called_once()
-        
+        mock_conn.request.assert_called_once()
+
         # Verify the item data format
-        call_args = mock_run.call_args[1]['input']
-        item_data = json.loads(call_args.decode())
+        method, path, body = mock_conn.request.call_args[0][:3]
+        assert method == 'POST'
+        assert path == '/object/item'
+        item_data = json.loads(body)
         assert item_data['name'] == 'example.com - new@example.com'
         assert item_data['login']['username'] == 'new@example.com'
         assert item_data['login']['password'] == 'newpass123'
+        # Server-default fields are omitted from the payload
+        assert 'organizationId' not in item_data
+        assert 'folderId' not in item_data
+        assert 'favorite' not in item_data
+        assert 'match' not in item_data['login']['uris'][0]
+
+    @patch('subprocess.run')
+    def test_create_bitwarden_item_without_serve(self, mock_run, sync_app):
+        sync_app.bw_session = 'mock-session'
+        sync_app._serve_ready = False
+        mock_run.return_value = Mock(returncode=0)
+        keychain_item = KeychainItem(
+            account='new@example.com',
+            service='example.com',
+            password='newpass123'
+        )
+
+        result = sync_app._create_bitwarden_item(keychain_item)
+
+        assert result is True
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0][:3] == ['bw', 'create', 'item']
 
 class TestSyncOperation:
     @patch.object(KeychainBitwardenSync, '_login_bitwarden')
@@ -209,6 +268,19 @@ class TestSyncOperation:
         assert created_item.account == 'user2@test.com'
         assert created_item.service == 'test.com'
 
+    @patch.object(KeychainBitwardenSync, '_login_bitwarden')
+    @patch.object(KeychainBitwardenSync, '_get_keychain_items')
+    @patch.object(KeychainBitwardenSync, '_get_bitwarden_items')
+    def test_sync_empty_keychain_skips_vault_fetch(
+        self, mock_get_bw, mock_get_kc, mock_login, sync_app
+    ):
+        mock_login.return_value = True
+        mock_get_kc.return_value = []
+
+        sync_app.sync(check_only=True)
+
+        mock_get_bw.assert_not_called()
+
     def test_sync_login_failure(self, sync_app):
         with patch.object(KeychainBitwardenSync, '_login_bitwarden') as mock_login:
             mock_login.return_value = False
@@ -239,9 +311,9 @@ class TestCommandLineInterface:
                 assert logging.getLogger('keychain-bw-sync').level == logging.DEBUG
 
 class TestErrorHandling:
-    @patch('subprocess.run')
-    def test_keychain_command_exception(self, mock_run, sync_app):
-        mock_run.side_effect = subprocess.SubprocessError()
+    @patch('subprocess.Popen')
+    def test_keychain_command_exception(self, mock_popen, sync_app):
+        mock_popen.side_effect = subprocess.SubprocessError()
         items = sync_app._get_keychain_items()
         assert items == []
 
@@ -252,8 +324,41 @@ class TestErrorHandling:
         items = sync_app._get_bitwarden_items()
         assert items == []
 
-    @patch('keyring.get_password')
-    def test_keychain_password_retrieval_error(self, mock_get_password, sync_app):
-        mock_get_password.side_effect = Exception('Access denied')
-        password = sync_app._get_keychain_password('test', 'test')
-        assert password == ''
+    @patch('subprocess.Popen')
+    def test_keychain_data_bad_hex(self, mock_popen, sync_app):
+        mock_popen.return_value = Mock(
+            returncode=0,
+            communicate=Mock(return_value=(b'''keychain: "x"
+attributes:
+    "acct"<blob>="user"
+    "svce"<blob>="service"
+data:
+0xfffe  "\\377\\376"
+''', b''))
+        )
+        items = sync_app._get_keychain_items()
+        assert items[0].password == '��'
+
+class TestKeychainDeduplication:
+    @patch('subprocess.Popen')
+    def test_duplicate_entries_collapsed(self, mock_popen, sync_app):
+        mock_popen.return_value = Mock(
+            returncode=0,
+            communicate=Mock(return_value=(b'''keychain: "x"
+attributes:
+    "acct"<blob>="user"
+    "svce"<blob>="example.com"
+data:
+"oldpass"
+
+keychain: "x"
+attributes:
+    "acct"<blob>="user"
+    "svce"<blob>="example.com"
+data:
+"newpass"
+''', b''))
+        )
+        items = sync_app._get_keychain_items()
+        assert len(items) == 1
+        assert items[0].password == 'newpass'